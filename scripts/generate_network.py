@@ -1,197 +1,204 @@
 #!/usr/bin/env python3
 import json
-import random
 import sys
-from typing import Dict, List, Sequence, Tuple
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 from scipy.spatial import Voronoi
 
+try:
+    import orjson
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+except ImportError:
+
+    def dumps(obj) -> str:
+        return json.dumps(obj, indent=2)
+
 
 # Tweakable percentages for pruning steps
 NODE_REMOVAL_FRACTION = 0.10
 EDGE_REMOVAL_FRACTION = 0.20
 
-
-def generate_city_points(num_points: int, width: float, height: float, iterations: int = 2) -> np.ndarray:
-    """Generate seed points with a gentle center bias then smooth with Lloyd relaxation."""
-    points: List[List[float]] = []
+FACILITY_TYPES_BY_MODE = {
+    "Bike": ["ProtectedLane", "BufferedLane", "SharedLane"],
+    "Walk": ["Sidewalk", "SharedUsePath", "Trail"],
+    "Transit": ["BusLane", "Rail", "BRT"],
+    "Car": ["Highway", "Arterial", "LocalStreet"],
+}
+
+
+def generate_city_points(
+    num_points: int, width: float, height: float, iterations: int = 2, rng: Optional[np.random.Generator] = None
+) -> Tuple[np.ndarray, Voronoi]:
+    """Generate seed points with a gentle center bias then smooth with Lloyd relaxation.
+
+    Also returns the Voronoi diagram of the final points so callers can reuse it.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    cx, cy = width / 2, height / 2
+    max_dist = np.hypot(cx, cy)
+    batch = max(2 * num_points, 1)
+    batches: List[np.ndarray] = []
+    accepted = 0
     attempts = 0
     max_attempts = num_points * 50
-    while len(points) < num_points and attempts < max_attempts:
-        attempts += 1
-        x = np.random.uniform(0, width)
-        y = np.random.uniform(0, height)
-        cx, cy = width / 2, height / 2
-        dist = np.sqrt((x - cx) ** 2 + (y - cy) ** 2)
-        max_dist = np.sqrt(cx**2 + cy**2)
-        norm_dist = (dist / max_dist) * 0.7
-        prob = (1 - norm_dist) ** 3
-        if np.random.rand() < prob:
-            points.append([x, y])
-
-    pts = np.array(points)
+    while accepted < num_points and attempts < max_attempts:
+        attempts += batch
+        xs = rng.uniform(0, width, batch)
+        ys = rng.uniform(0, height, batch)
+        dist = np.hypot(xs - cx, ys - cy)
+        prob = (1 - (dist / max_dist) * 0.7) ** 3
+        mask = rng.random(batch) < prob
+        batches.append(np.stack([xs[mask], ys[mask]], axis=1))
+        accepted += int(mask.sum())
+
+    pts = np.concatenate(batches)[:num_points] if batches else np.empty((0, 2))
+    bounds = np.array([width, height])
+    relaxed = np.empty_like(pts)
+    vor = Voronoi(pts)
     for _ in range(iterations):
-        vor = Voronoi(pts)
-        relaxed_points = []
-        for idx, region_index in enumerate(vor.point_region):
-            region = vor.regions[region_index]
-            if -1 in region or len(region) == 0:
-                relaxed_points.append(pts[idx])
-                continue
-            vertices = np.array([vor.vertices[i] for i in region])
-            centroid = np.mean(vertices, axis=0)
-            if 0 <= centroid[0] <= width and 0 <= centroid[1] <= height:
-                relaxed_points.append(centroid)
-            else:
-                relaxed_points.append(pts[idx])
-        pts = np.array(relaxed_points)
-    return pts
-
-
-def build_base_graph(points: np.ndarray, width: float, height: float) -> Tuple[List[Dict], List[Tuple[int, int]]]:
-    """Convert Voronoi ridges into nodes/edges we can reuse across modes."""
-    vor = Voronoi(points)
-    nodes: List[Dict] = []
-    base_edges: List[Tuple[int, int]] = []
-    node_mapping: Dict[Tuple[float, float], int] = {}
-    edge_seen = set()
-
-    def ensure_node(coord: Tuple[float, float]) -> int:
-        if coord not in node_mapping:
-            node_id = len(nodes)
-            node_mapping[coord] = node_id
-            nodes.append(
-                {
-                    "id": node_id,
-                    "position": [coord[0], coord[1]],
-                    "node_type": "Intersection",
-                    "physical_attributes": [],
-                    "turn_restrictions": [],
-                }
-            )
-        return node_mapping[coord]
-
-    for p1_idx, p2_idx in vor.ridge_vertices:
-        if p1_idx == -1 or p2_idx == -1:
-            continue
-        p1 = vor.vertices[p1_idx]
-        p2 = vor.vertices[p2_idx]
-        if not (0 <= p1[0] <= width and 0 <= p1[1] <= height):
-            continue
-        if not (0 <= p2[0] <= width and 0 <= p2[1] <= height):
-            continue
-        n1 = (round(float(p1[0]), 2), round(float(p1[1]), 2))
-        n2 = (round(float(p2[0]), 2), round(float(p2[1]), 2))
-        if n1 == n2:
-            continue
-        edge_key = tuple(sorted((n1, n2)))
-        if edge_key in edge_seen:
-            continue
-        edge_seen.add(edge_key)
-        node_a = ensure_node(n1)
-        node_b = ensure_node(n2)
-        base_edges.append((node_a, node_b))
-
-    return nodes, base_edges
-
-
-def knock_out_edges(base_edges: Sequence[Tuple[int, int]], removal_fraction: float) -> List[Tuple[int, int]]:
-    """Remove a fraction of edges to shape a mode-specific graph."""
-    if not base_edges or removal_fraction <= 0:
-        return list(base_edges)
-    edge_indices = list(range(len(base_edges)))
-    remove_count = min(len(base_edges), int(len(base_edges) * removal_fraction))
-    to_remove = set(random.sample(edge_indices, remove_count)) if remove_count else set()
-    return [edge for idx, edge in enumerate(base_edges) if idx not in to_remove]
-
-
-def prune_nodes_for_mode(nodes: List[Dict], base_edges: Sequence[Tuple[int, int]], removal_fraction: float):
-    """Remove a fraction of nodes for a mode, along with any incident edges."""
-    if not nodes or removal_fraction <= 0:
-        return [dict(node) for node in nodes], list(base_edges)
-
-    node_ids = [node["id"] for node in nodes]
-    remove_count = min(len(node_ids), int(len(node_ids) * removal_fraction))
-    removed_ids = set(random.sample(node_ids, remove_count)) if remove_count else set()
-
-    remaining_nodes = [dict(node) for node in nodes if node["id"] not in removed_ids]
-    remaining_edges = [edge for edge in base_edges if edge[0] not in removed_ids and edge[1] not in removed_ids]
-    return remaining_nodes, remaining_edges
-
-
-def reindex_nodes_and_edges(nodes: List[Dict], edges: Sequence[Tuple[int, int]]) -> Tuple[List[Dict], List[Tuple[int, int]]]:
-    """Drop isolated nodes and remap node IDs so edges stay in-bounds."""
-    if not edges:
-        return [], []
-
-    connected_ids = set()
-    for src, dst in edges:
-        connected_ids.add(src)
-        connected_ids.add(dst)
-
-    filtered_nodes = [dict(node) for node in nodes if node["id"] in connected_ids]
-    id_map = {node["id"]: idx for idx, node in enumerate(filtered_nodes)}
-    for node in filtered_nodes:
-        node["id"] = id_map[node["id"]]
-
-    remapped_edges = []
-    for src, dst in edges:
-        if src in id_map and dst in id_map:
-            remapped_edges.append((id_map[src], id_map[dst]))
-
-    return filtered_nodes, remapped_edges
-
-
-def generate_mode_graph(mode: str, nodes: List[Dict], base_edges: Sequence[Tuple[int, int]]) -> Dict:
-    """Build a single mode graph from the shared base topology."""
-    facility_types_by_mode = {
-        "Bike": ["ProtectedLane", "BufferedLane", "SharedLane"],
-        "Walk": ["Sidewalk", "SharedUsePath", "Trail"],
-        "Transit": ["BusLane", "Rail", "BRT"],
-        "Car": ["Highway", "Arterial", "LocalStreet"],
-    }
-    facility_types = facility_types_by_mode.get(mode, ["Generic"])
-    mode_nodes, node_pruned_edges = prune_nodes_for_mode(nodes, base_edges, NODE_REMOVAL_FRACTION)
-    mode_edges_raw = knock_out_edges(node_pruned_edges, EDGE_REMOVAL_FRACTION)
-    mode_nodes, mode_edges_raw = reindex_nodes_and_edges(mode_nodes, mode_edges_raw)
-
-    edges = []
-    for edge_id, (src, dst) in enumerate(mode_edges_raw):
-        edges.append(
-            {
-                "id": edge_id,
-                "from_node": src,
-                "to_node": dst,
-                "facility_type": random.choice(facility_types),
-                "physical_attributes": [],
-            }
+        region_count = len(vor.regions)
+        region_sizes = np.fromiter(map(len, vor.regions), dtype=np.int64, count=region_count)
+        # Flatten the ragged region table once so bincount can sum every region's vertices together.
+        flat_idx = np.fromiter(chain.from_iterable(vor.regions), dtype=np.int64, count=int(region_sizes.sum()))
+        region_of = np.repeat(np.arange(region_count), region_sizes)
+        vertices = vor.vertices[flat_idx]
+        sums = np.stack(
+            [np.bincount(region_of, weights=vertices[:, axis], minlength=region_count) for axis in range(2)],
+            axis=1,
         )
 
+        # Unbounded regions reference the vertex at infinity (-1); they keep their point.
+        unbounded = np.bincount(region_of, weights=flat_idx == -1, minlength=region_count) > 0
+        region_valid = (region_sizes > 0) & ~unbounded
+        valid = region_valid[vor.point_region]
+        point_region = vor.point_region[valid]
+        centroids = sums[point_region] / region_sizes[point_region, None]
+        in_bounds = ((centroids >= 0) & (centroids <= bounds)).all(axis=1)
+
+        # Points whose centroid is unusable stay put; the two buffers swap roles each pass.
+        np.copyto(relaxed, pts)
+        relaxed[np.flatnonzero(valid)[in_bounds]] = centroids[in_bounds]
+        pts, relaxed = relaxed, pts
+        # Rebuild even on the last pass: callers reuse this diagram, so it must describe the moved points.
+        vor = Voronoi(pts)
+    return pts, vor
+
+
+def build_base_graph(
+    points: np.ndarray, width: float, height: float, vor: Optional[Voronoi] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert Voronoi ridges into node positions and edges we can reuse across modes."""
+    if vor is None:
+        vor = Voronoi(points)
+    # Bounds-check and round once per Voronoi vertex rather than once per ridge endpoint.
+    bounds = np.array([width, height])
+    vertex_in_bounds = ((vor.vertices >= 0) & (vor.vertices <= bounds)).all(axis=1)
+    rounded = np.round(vor.vertices, 2)
+
+    ridges = np.asarray(vor.ridge_vertices, dtype=np.int64).reshape(-1, 2)
+    ridges = ridges[(ridges != -1).all(axis=1)]
+    ridges = ridges[vertex_in_bounds[ridges].all(axis=1)]
+    ridges = ridges[(rounded[ridges[:, 0]] != rounded[ridges[:, 1]]).any(axis=1)]
+
+    # Vertices that round to the same coordinate collapse into a single node.
+    used_vertices = np.unique(ridges)
+    positions, inverse = np.unique(rounded[used_vertices], axis=0, return_inverse=True)
+    node_of_vertex = np.zeros(len(vor.vertices), dtype=np.int64)
+    node_of_vertex[used_vertices] = inverse.reshape(-1)
+
+    base_edges = node_of_vertex[ridges]
+    base_edges.sort(axis=1)
+    base_edges = np.unique(base_edges, axis=0)
+
+    return positions, base_edges
+
+
+def random_removal_mask(count: int, removal_fraction: float, rng: np.random.Generator) -> np.ndarray:
+    """Flag a random fraction of `count` items for removal."""
+    removed = np.zeros(count, dtype=bool)
+    remove_count = min(count, int(count * removal_fraction))
+    if remove_count > 0:
+        removed[rng.choice(count, size=remove_count, replace=False, shuffle=False)] = True
+    return removed
+
+
+def reindex_nodes_and_edges(node_count: int, edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Drop isolated nodes and remap node IDs so edges stay in-bounds.
+
+    Returns the original IDs of the surviving nodes alongside the remapped edges.
+    """
+    connected = np.zeros(node_count, dtype=bool)
+    connected[edges.ravel()] = True
+    id_map = np.cumsum(connected) - 1
+    return np.flatnonzero(connected), id_map[edges]
+
+
+def generate_mode_graph(
+    mode: str, positions: np.ndarray, base_edges: np.ndarray, seed: np.random.SeedSequence
+) -> Dict:
+    """Build a single mode graph from the shared base topology.
+
+    Each mode draws from its own seeded RNG so its pruning is independent of the others.
+    """
+    rng = np.random.default_rng(seed)
+    facility_types = FACILITY_TYPES_BY_MODE.get(mode, ["Generic"])
+    # Removed nodes take their incident edges with them; both cuts share one keep-mask.
+    node_removed = random_removal_mask(len(positions), NODE_REMOVAL_FRACTION, rng)
+    edge_removed = random_removal_mask(len(base_edges), EDGE_REMOVAL_FRACTION, rng)
+    keep = ~edge_removed & ~node_removed[base_edges[:, 0]] & ~node_removed[base_edges[:, 1]]
+    node_ids, mode_edges_raw = reindex_nodes_and_edges(len(positions), base_edges[keep])
+
+    mode_nodes = [
+        {
+            "id": node_id,
+            "position": position,
+            "node_type": "Intersection",
+            "physical_attributes": [],
+            "turn_restrictions": [],
+        }
+        for node_id, position in enumerate(positions[node_ids].tolist())
+    ]
+
+    facility_idx = rng.integers(len(facility_types), size=len(mode_edges_raw)).tolist()
+    edges = [
+        {
+            "id": edge_id,
+            "from_node": src,
+            "to_node": dst,
+            "facility_type": facility_types[type_idx],
+            "physical_attributes": [],
+        }
+        for edge_id, ((src, dst), type_idx) in enumerate(zip(mode_edges_raw.tolist(), facility_idx))
+    ]
+
     return {"mode": mode, "nodes": mode_nodes, "edges": edges}
 
 
-def generate_network(n: int, modes=None):
-    """Generate a network with multiple mode graphs from one Voronoi base."""
+def generate_network(n: int, modes=None, seed: Optional[int] = None):
+    """Generate a network with multiple mode graphs from one Voronoi base.
+
+    Passing `seed` makes the whole network, including every mode graph, reproducible.
+    """
     if modes is None:
         modes = ["Bike", "Walk"]
 
+    points_seed, *mode_seeds = np.random.SeedSequence(seed).spawn(len(modes) + 1)
     map_size = max(30.0, (n ** 0.5) * 10.0)
-    points = generate_city_points(n, map_size, map_size, iterations=3)
-    nodes, base_edges = build_base_graph(points, map_size, map_size)
-
-    if nodes:
-        xs = [node["position"][0] for node in nodes]
-        zs = [node["position"][1] for node in nodes]
-        center_x = (min(xs) + max(xs)) / 2.0
-        center_z = (min(zs) + max(zs)) / 2.0
-        for node in nodes:
-            node["position"][0] -= center_x
-            node["position"][1] -= center_z
+    points, vor = generate_city_points(n, map_size, map_size, iterations=3, rng=np.random.default_rng(points_seed))
+    positions, base_edges = build_base_graph(points, map_size, map_size, vor)
+
+    if len(positions):
+        positions -= 0.5 * (positions.min(axis=0) + positions.max(axis=0))
 
     graphs = {}
-    for mode in modes:
-        graphs[mode] = generate_mode_graph(mode, nodes, base_edges)
+    for mode, mode_seed in zip(modes, mode_seeds):
+        graphs[mode] = generate_mode_graph(mode, positions, base_edges, mode_seed)
 
     return {"graphs": graphs}
 
@@ -199,5 +206,6 @@ def generate_network(n: int, modes=None):
 if __name__ == "__main__":
     n = int(sys.argv[1]) if len(sys.argv) > 1 else 25
     modes = sys.argv[2].split(",") if len(sys.argv) > 2 else ["Bike", "Walk", "Transit"]
-    network = generate_network(n, modes)
-    print(json.dumps(network, indent=2))
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    network = generate_network(n, modes, seed)
+    print(dumps(network))
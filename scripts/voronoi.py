@@ -4,9 +4,19 @@ from scipy.spatial import Voronoi
 import networkx as nx
 import json
 
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:
+    def dumps(obj):
+        return json.dumps(obj, indent=2)
+
 def generate_city_points(num_points=1000, width=100, height=100, iterations=3):
     """
     Generates organic city block centers using Lloyd's Relaxation.
+    Returns the points along with their final Voronoi diagram.
     """
     points = []
     # Safety break to prevent infinite loops if constraints are too tight
@@ -36,8 +46,8 @@ def generate_city_points(num_points=1000, width=100, height=100, iterations=3):
     points = np.array(points)
 
     # Lloyd's Relaxation
+    vor = Voronoi(points)
     for _ in range(iterations):
-        vor = Voronoi(points)
         new_points = []
         for i, region_index in enumerate(vor.point_region):
             region = vor.regions[region_index]
@@ -55,14 +65,17 @@ def generate_city_points(num_points=1000, width=100, height=100, iterations=3):
                 new_points.append(points[i])
                 
         points = np.array(new_points)
+        vor = Voronoi(points)
 
-    return points
+    return points, vor
 
-def build_graph_from_voronoi(points, width, height):
+def build_graph_from_voronoi(points, width, height, vor=None):
     """
     Converts Voronoi ridges into a NetworkX graph, filtering out-of-bounds edges.
+    Pass `vor` to reuse a diagram already computed for `points`.
     """
-    vor = Voronoi(points)
+    if vor is None:
+        vor = Voronoi(points)
     G = nx.Graph()
     
     for p1_idx, p2_idx in vor.ridge_vertices:
@@ -144,23 +157,24 @@ def export_graph_to_json(G, filename="city_graph.json"):
         })
         
     # Write to file
+    json_str = dumps(output_data)
     with open(filename, 'w') as f:
-        json.dump(output_data, f, indent=2)
+        f.write(json_str)
         
     print(f"Successfully exported {len(output_data['nodes'])} nodes and {len(output_data['edges'])} edges to '{filename}'")
     
     # Return string for preview
-    return json.dumps(output_data, indent=2)
+    return json_str
 
 if __name__ == "__main__":
     MAP_SIZE = 100
     DENSITY = 300
     
     print("Generating city points...")
-    points = generate_city_points(DENSITY, MAP_SIZE, MAP_SIZE, iterations=3)
+    points, vor = generate_city_points(DENSITY, MAP_SIZE, MAP_SIZE, iterations=3)
     
     print("Building street graph...")
-    street_graph = build_graph_from_voronoi(points, MAP_SIZE, MAP_SIZE)
+    street_graph = build_graph_from_voronoi(points, MAP_SIZE, MAP_SIZE, vor)
     
     print("Exporting to JSON...")
     json_str = export_graph_to_json(street_graph, "city_data.json")